@@ -1,27 +1,61 @@
-import json
-import numpy as np
+import os
+import re
 import faiss
+import torch
 import streamlit as st
-from sentence_transformers import SentenceTransformer
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+from common import OUT_DIR, MODEL_NAME, embed, get_model, load_index, read_json, search
 
-OUT_DIR = "artifacts"
-MODEL_NAME = "all-MiniLM-L6-v2"
+_WS = re.compile(r"\s+")
+
+torch.set_num_threads(max(1, os.cpu_count() or 1))
+faiss.omp_set_num_threads(max(1, os.cpu_count() or 1))
 
 st.set_page_config(page_title="AI Semantic Search", page_icon="🔎", layout="wide")
 
 @st.cache_resource
 def load_model():
-    return SentenceTransformer(MODEL_NAME)
+    return get_model(MODEL_NAME)
+
+class ArrowColumn:
+    # Row access into a memory-mapped Arrow column; only requested rows become Python strs.
+    def __init__(self, col):
+        self.col = col
+
+    def __getitem__(self, i):
+        return self.col[int(i)].as_py()
+
+    def __len__(self):
+        return len(self.col)
 
 @st.cache_resource
 def load_data():
-    index = faiss.read_index(f"{OUT_DIR}/faiss.index")
-    docs = json.load(open(f"{OUT_DIR}/docs.json", "r", encoding="utf-8"))
-    meta = json.load(open(f"{OUT_DIR}/meta.json", "r", encoding="utf-8"))
-    return index, docs, meta
+    index, emb = load_index(OUT_DIR)
+    if pa is not None and os.path.exists(f"{OUT_DIR}/docs.arrow"):
+        tbl = pa.ipc.open_file(pa.memory_map(f"{OUT_DIR}/docs.arrow")).read_all()
+        docs, sources = ArrowColumn(tbl["text"]), ArrowColumn(tbl["source"])
+    else:
+        docs = read_json(f"{OUT_DIR}/docs.json")
+        meta = read_json(f"{OUT_DIR}/meta.json")
+        sources = [m["source"] for m in meta]
+    return index, emb, docs, sources
+
+@st.cache_data(show_spinner=False, persist="disk", max_entries=10_000)
+def embed_query(q, model_name=MODEL_NAME, variant="torch"):
+    # model_name and the encoder variant (PyTorch / FP32 or int8 ONNX export) are
+    # part of the cache key, so vectors from a previous build's backend aren't reused.
+    return embed(load_model(), [q])
 
 def snippet(text, n=280):
-    t = " ".join(text.strip().split())
+    # Collapse only a bounded prefix; fall back to the whole text when the
+    # prefix was actually cut and doesn't already yield more than n chars.
+    k = max(n, 0)
+    t = _WS.sub(" ", text[: k * 2]).strip()
+    if len(t) <= k and len(text) > k * 2:
+        t = _WS.sub(" ", text).strip()
     return t if len(t) <= n else t[:n] + "…"
 
 st.title("🔎 AI Semantic Search Engine")
@@ -30,16 +64,17 @@ st.caption("Search documents by meaning using embeddings + FAISS.")
 query = st.text_input("", placeholder="Ask anything… e.g. 'ETL automation and dashboards'")
 top_k = st.slider("Top results", 1, 10, 5)
 
-model = load_model()
-index, docs, meta = load_data()
+load_model()
+index, emb, docs, sources = load_data()
 
 if query:
-    q_emb = model.encode([query], convert_to_numpy=True, normalize_embeddings=True).astype(np.float32)
-    scores, ids = index.search(q_emb, top_k)
+    q_emb = embed_query(query, MODEL_NAME, getattr(load_model(), "variant", "torch"))
+    scores, ids = search(index, emb, q_emb, top_k)
 
     st.subheader("Results")
-    for rank, (score, idx) in enumerate(zip(scores[0], ids[0]), 1):
-        st.markdown(f"**{rank}. {meta[idx]['source']}** — score `{score:.3f}`")
+    hits = [(score, idx) for score, idx in zip(scores[0], ids[0]) if idx >= 0]
+    for rank, (score, idx) in enumerate(hits, 1):
+        st.markdown(f"**{rank}. {sources[idx]}** — score `{score:.3f}`")
         st.write(snippet(docs[idx]))
         st.divider()
 else:
@@ -4,10 +4,13 @@
 
 from __future__ import annotations
 
+import json
 import os
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, Iterator, List, Optional
 
 import requests
+from requests.adapters import HTTPAdapter
 import streamlit as st
 from duckduckgo_search import DDGS
 
@@ -29,6 +32,8 @@ MODEL_OPTIONS = [
     "mixtral-8x7b-32768",
 ]
 
+WEB_TIMEOUT_S = 8
+
 
 # -----------------------------
 # Helpers
@@ -38,34 +43,59 @@ def clip(s: str, n: int) -> str:
     return s if len(s) <= n else s[: n - 1] + "…"
 
 
+@st.cache_data(ttl=86400, show_spinner=False)
+def _ddg_fetch(query: str, max_results: int) -> List[Dict[str, str]]:
+    # Raises on failure so rate-limit errors are not cached for a day.
+    out: List[Dict[str, str]] = []
+    with DDGS() as ddgs:
+        for r in ddgs.text(query, max_results=max_results):
+            out.append(
+                {
+                    "title": (r.get("title") or "").strip(),
+                    "url": (r.get("href") or "").strip(),
+                    "snippet": (r.get("body") or "").strip(),
+                }
+            )
+    return [r for r in out if r.get("url")]
+
+
 def ddg_search(query: str, max_results: int = 5) -> List[Dict[str, str]]:
     query = (query or "").strip()
     if not query:
         return []
 
-    out: List[Dict[str, str]] = []
     try:
-        with DDGS() as ddgs:
-            for r in ddgs.text(query, max_results=max_results):
-                out.append(
-                    {
-                        "title": (r.get("title") or "").strip(),
-                        "url": (r.get("href") or "").strip(),
-                        "snippet": (r.get("body") or "").strip(),
-                    }
-                )
+        return _ddg_fetch(query, max_results)
     except Exception:
         return []
 
-    return [r for r in out if r.get("url")]
+
+@st.cache_resource
+def _executor() -> ThreadPoolExecutor:
+    # Shared across reruns; a hung DDG lookup must not block the next query.
+    return ThreadPoolExecutor(max_workers=4)
 
 
-def groq_chat(
+@st.cache_resource
+def _groq_session() -> requests.Session:
+    # Keep-alive session reused across reruns so the TLS handshake is paid once.
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+    session.headers.update(
+        {
+            "Authorization": f"Bearer {GROQ_API_KEY}",
+            "Content-Type": "application/json",
+        }
+    )
+    return session
+
+
+def groq_chat_stream(
     user_query: str,
     model: str,
     web_results: Optional[List[Dict[str, str]]] = None,
     timeout_s: int = 45,
-) -> str:
+) -> Iterator[str]:
     if not GROQ_API_KEY:
         raise RuntimeError("GROQ_API_KEY is not set.")
 
@@ -96,51 +126,75 @@ def groq_chat(
     payload = {
         "model": model,
         "temperature": 0.2,
+        "stream": True,
         "messages": [
             {"role": "system", "content": system},
             {"role": "user", "content": user},
         ],
     }
 
-    resp = requests.post(
-        GROQ_BASE_URL,
-        headers={
-            "Authorization": f"Bearer {GROQ_API_KEY}",
-            "Content-Type": "application/json",
-        },
-        json=payload,
-        timeout=timeout_s,
-    )
-    resp.raise_for_status()
-    data = resp.json()
-    return (data["choices"][0]["message"]["content"] or "").strip()
+    # Server-sent events: one "data: {...}" chunk per token batch, then "data: [DONE]".
+    with _groq_session().post(GROQ_BASE_URL, json=payload, timeout=timeout_s, stream=True) as resp:
+        resp.raise_for_status()
+        # Decode each line as UTF-8 ourselves: text/event-stream often has no
+        # charset, and requests would then fall back to ISO-8859-1.
+        for raw in resp.iter_lines():
+            line = raw.decode("utf-8")
+            if not line.startswith("data: "):
+                continue
+            data = line[len("data: "):]
+            if data.strip() == "[DONE]":
+                break
+            chunk = json.loads(data)
+            if "error" in chunk:
+                err = chunk["error"]
+                raise RuntimeError(err.get("message", str(err)) if isinstance(err, dict) else str(err))
+            delta = chunk["choices"][0].get("delta") or {}
+            if delta.get("content"):
+                yield delta["content"]
+
+
+def error_message(e: Exception) -> str:
+    if isinstance(e, requests.HTTPError):
+        code = getattr(e.response, "status_code", None)
+        if code == 401:
+            return (
+                "Unauthorized (401). Your GROQ_API_KEY is missing/invalid.\n"
+                "Fix: set GROQ_API_KEY correctly and restart."
+            )
+        return f"Request failed: {clip(str(e), 220)}"
+    return f"Error: {clip(str(e), 220)}"
 
 
-def run_query(query: str, use_web: bool, n_web: int, model: str):
+def stream_answer(tokens: Iterator[str]) -> str:
+    # Renders tokens as they arrive; the full text is kept for later reruns.
+    try:
+        answer = st.write_stream(tokens)
+    except Exception as e:
+        answer = error_message(e)
+        st.write(answer)
+    return (answer if isinstance(answer, str) else "".join(map(str, answer))).strip()
+
+
+def run_query(query: str, use_web: bool, n_web: int, model: str) -> Optional[Iterator[str]]:
     query = (query or "").strip()
     if not query:
         st.session_state.answer = "Type a question first."
         st.session_state.web = []
-        return
-
-    web_results = ddg_search(query, max_results=n_web) if use_web else []
+        return None
+
+    web_results: List[Dict[str, str]] = []
+    if use_web:
+        # The LLM prompt needs the sources, so bound how long we wait for them.
+        fut_web = _executor().submit(ddg_search, query, n_web)
+        try:
+            web_results = fut_web.result(timeout=WEB_TIMEOUT_S)
+        except FutureTimeout:
+            web_results = []
     st.session_state.web = web_results
+    st.session_state.answer = ""
 
-    try:
-        st.session_state.answer = groq_chat(
-            query, model=model, web_results=web_results if use_web else []
-        )
-    except requests.HTTPError as e:
-        code = getattr(e.response, "status_code", None)
-        if code == 401:
-            st.session_state.answer = (
-                "Unauthorized (401). Your GROQ_API_KEY is missing/invalid.\n"
-                "Fix: set GROQ_API_KEY correctly and restart."
-            )
-        else:
-            st.session_state.answer = f"Request failed: {clip(str(e), 220)}"
-    except Exception as e:
-        st.session_state.answer = f"Error: {clip(str(e), 220)}"
+    return groq_chat_stream(query, model=model, web_results=web_results if use_web else [])
 
 
 # -----------------------------
@@ -347,13 +401,18 @@ if go:
     st.session_state.use_web = bool(use_web)
     st.session_state.n_web = int(n_web)
     st.session_state.model = model
-    run_query(q, use_web=bool(use_web), n_web=int(n_web), model=model)
+    answer_stream = run_query(q, use_web=bool(use_web), n_web=int(n_web), model=model)
+else:
+    answer_stream = None
 
 # Results (embedded; NO page scroll)
-if st.session_state.answer:
+if answer_stream is not None or st.session_state.answer:
     st.markdown('<div class="resultsBox">', unsafe_allow_html=True)
     st.markdown("**Answer**")
-    st.write(st.session_state.answer)
+    if answer_stream is not None:
+        st.session_state.answer = stream_answer(answer_stream)
+    else:
+        st.write(st.session_state.answer)
 
     if st.session_state.use_web and st.session_state.web:
         st.markdown("**Sources**")
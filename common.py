@@ -0,0 +1,84 @@
+import os
+import json
+import functools
+import numpy as np
+import faiss
+from sentence_transformers import SentenceTransformer
+try:
+    import orjson
+except ImportError:
+    orjson = None
+from onnx_encoder import load_onnx_encoder
+
+OUT_DIR = "artifacts"
+MODEL_NAME = "all-MiniLM-L6-v2"
+HNSW_EF_SEARCH = 64
+IVF_NPROBE = 16
+RERANK_FACTOR = 4
+
+def read_json(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+# One model per process: the search REPL, app.py and scripts only pay the
+# load (and warmup) cost on first use.
+@functools.lru_cache(maxsize=1)
+def get_model(name=MODEL_NAME):
+    encoder = load_onnx_encoder(name, f"{OUT_DIR}/onnx")
+    m = encoder if encoder is not None else SentenceTransformer(name)
+    _ = m.encode(["warm"], convert_to_numpy=True)
+    return m
+
+def embed(model, texts):
+    q_emb = model.encode(texts, convert_to_numpy=True).astype(np.float32, copy=False)
+    faiss.normalize_L2(q_emb)
+    return q_emb
+
+def tune_index(index):
+    # Search parameters live on the base index under the PCA + normalize chain.
+    base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexPreTransform) else index
+    if hasattr(base, "hnsw"):
+        base.hnsw.efSearch = HNSW_EF_SEARCH
+    if hasattr(base, "nprobe"):
+        base.nprobe = IVF_NPROBE
+
+def load_index(out_dir=OUT_DIR):
+    # Returns (index, emb); emb is the mmap'd FP32 rerank copy for the binary index, else None.
+    if os.path.exists(f"{out_dir}/faiss_binary.index"):
+        index = faiss.read_index_binary(f"{out_dir}/faiss_binary.index")
+        # FP32 vectors are only touched for reranked candidates.
+        emb = np.load(f"{out_dir}/embeddings.npy", mmap_mode="r")
+        index.search(np.zeros((1, index.d // 8), np.uint8), 1)
+        return index, emb
+
+    # Zero-copy mmap of the stored codes (flat/SQ/HNSW and IVF lists alike)
+    # instead of copying the whole index into anonymous memory at startup.
+    # IO_FLAG_MMAP only covers IVF lists and can't be combined with MMAP_IFC.
+    index = faiss.read_index(f"{out_dir}/faiss.index", faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+    tune_index(index)
+    if faiss.get_num_gpus() > 0:
+        try:
+            index = faiss.index_cpu_to_gpu(faiss.StandardGpuResources(), 0, index)
+        except RuntimeError:
+            # HNSW has no GPU implementation; keep searching on CPU.
+            pass
+    index.search(np.zeros((1, index.d), np.float32), 1)
+    return index, None
+
+def search(index, emb, q_emb, top_k):
+    if emb is None:
+        return index.search(q_emb, top_k)
+
+    # Hamming search over sign bits, then exact cosine rerank of the candidates.
+    # Missing results are padded with id -1, like a regular FAISS search.
+    _, cand = index.search(np.packbits(q_emb > 0, axis=1), top_k * RERANK_FACTOR)
+    scores = np.full((len(q_emb), top_k), -np.inf, dtype=np.float32)
+    ids = np.full((len(q_emb), top_k), -1, dtype=np.int64)
+    for i, row in enumerate(cand):
+        row = row[row >= 0]
+        s = emb[row] @ q_emb[i]
+        best = np.argsort(-s)[:top_k]
+        scores[i, :len(best)] = s[best]
+        ids[i, :len(best)] = row[best]
+    return scores, ids
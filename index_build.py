@@ -1,13 +1,180 @@
 import os
 import glob
 import json
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import faiss
 from sentence_transformers import SentenceTransformer
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+from common import OUT_DIR, MODEL_NAME, tune_index
+from onnx_encoder import export_onnx, quantize_onnx
 
 DATA_DIR = "data"
-OUT_DIR = "artifacts"
-MODEL_NAME = "all-MiniLM-L6-v2"
+BATCH_SIZE = 64
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+IVFPQ_MIN_DOCS = 10_000
+PQ_M = 16
+PQ_NBITS = 8
+# PCA needs enough samples to estimate the covariance; small corpora stay full-dim.
+# The reduced index is only kept if its recall@10 against exact cosine search
+# on a sample of held-out queries reaches PCA_MIN_RECALL.
+PCA_MIN_DOCS = 2_000
+PCA_DIM = 128
+PCA_MIN_RECALL = 0.95
+RECALL_QUERIES = 200
+RECALL_K = 10
+INT8_SAMPLE_DOCS = 64
+# ~1000 chars comfortably covers MiniLM's 256-token window; longer docs are
+# split into overlapping chunks (capped) and their embeddings mean-pooled.
+CHUNK_CHARS = 1000
+CHUNK_OVERLAP = 100
+MAX_CHUNKS = 8
+# "auto" picks HNSW/IVFPQ by corpus size; "binary" builds a sign-bit Hamming
+# index plus an FP32 copy of the embeddings for reranking.
+INDEX_KIND = os.getenv("INDEX_KIND", "auto").strip().lower()
+
+def chunk_text(text):
+    step = CHUNK_CHARS - CHUNK_OVERLAP
+    end = min(max(len(text) - CHUNK_OVERLAP, 1), step * MAX_CHUNKS)
+    return [text[i:i + CHUNK_CHARS] for i in range(0, end, step)]
+
+def encode_docs(model, docs):
+    chunks = []
+    starts = []
+    for d in docs:
+        starts.append(len(chunks))
+        chunks.extend(chunk_text(d))
+
+    # encode() already length-sorts its inputs into batches (smart batching)
+    # and restores corpus order, so only the batch size is set here.
+    chunk_emb = model.encode(
+        chunks,
+        batch_size=BATCH_SIZE,
+        show_progress_bar=True,
+        convert_to_numpy=True
+    ).astype(np.float32, copy=False)
+    faiss.normalize_L2(chunk_emb)
+
+    # Mean-pool each doc's chunks (contiguous rows) and renormalize.
+    counts = np.diff(starts + [len(chunks)])
+    embeddings = (np.add.reduceat(chunk_emb, starts, axis=0) / counts[:, None]).astype(np.float32)
+    faiss.normalize_L2(embeddings)
+    return embeddings
+
+def build_base_index(embeddings):
+    # Vectors are L2-normalized, so inner product == cosine similarity.
+    n, d = embeddings.shape
+
+    if n > IVFPQ_MIN_DOCS:
+        # Large corpora: IVF partitioning + PQ codes (~96 B/vec instead of 1.5 KB).
+        nlist = int(np.sqrt(n))
+        quantizer = faiss.IndexFlatIP(d)
+        index = faiss.IndexIVFPQ(quantizer, d, nlist, PQ_M, PQ_NBITS, faiss.METRIC_INNER_PRODUCT)
+        if faiss.get_num_gpus() > 0:
+            # k-means training + PQ encoding are GEMM-heavy; do them on the GPU
+            # and bring the index back to CPU for serialization.
+            res = faiss.StandardGpuResources()
+            gpu_index = faiss.index_cpu_to_gpu(res, 0, index)
+            gpu_index.train(embeddings)
+            gpu_index.add(embeddings)
+            return faiss.index_gpu_to_cpu(gpu_index)
+        index.train(embeddings)
+        index.add(embeddings)
+        return index
+
+    # HNSW graph over FP16 vector storage: half the bytes read per distance.
+    index = faiss.IndexHNSWSQ(d, faiss.ScalarQuantizer.QT_fp16, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    index.train(embeddings)
+    index.add(embeddings)
+    return index
+
+def recall_at_k(index, embeddings):
+    # Sampled docs act as queries; their own row is dropped from both result
+    # lists so each query is held out from the neighbours it is scored on.
+    rng = np.random.default_rng(0)
+    qids = rng.choice(len(embeddings), min(RECALL_QUERIES, len(embeddings)), replace=False)
+    queries = embeddings[qids]
+
+    exact = faiss.IndexFlatIP(embeddings.shape[1])
+    exact.add(embeddings)
+    _, truth = exact.search(queries, RECALL_K + 1)
+
+    tune_index(index)
+    _, found = index.search(queries, RECALL_K + 1)
+
+    hits = 0
+    for qid, t, f in zip(qids, truth, found):
+        t = [i for i in t if i != qid][:RECALL_K]
+        f = [i for i in f if i != qid and i >= 0][:RECALL_K]
+        hits += len(set(t) & set(f))
+    return hits / (len(qids) * RECALL_K)
+
+def build_index(embeddings):
+    n, d = embeddings.shape
+    if n < PCA_MIN_DOCS:
+        return build_base_index(embeddings)
+
+    # Project 384 -> 128 dims, then re-normalize: PCA centers and projects, so
+    # projected norms vary per doc and inner product would no longer be cosine.
+    # IndexPreTransform applies the same chain to queries inside index.search.
+    pca = faiss.PCAMatrix(d, PCA_DIM)
+    pca.train(embeddings)
+    reduced = pca.apply(embeddings)
+    faiss.normalize_L2(reduced)
+    index = faiss.IndexPreTransform(build_base_index(reduced))
+    index.prepend_transform(faiss.NormalizationTransform(PCA_DIM))
+    index.prepend_transform(pca)
+
+    recall = recall_at_k(index, embeddings)
+    if recall >= PCA_MIN_RECALL:
+        print(f"📉 PCA {d} -> {PCA_DIM} kept (recall@{RECALL_K} {recall:.3f})")
+        return index
+
+    print(f"⚠️ PCA {d} -> {PCA_DIM} dropped (recall@{RECALL_K} {recall:.3f} < {PCA_MIN_RECALL}), keeping {d} dims")
+    return build_base_index(embeddings)
+
+def build_binary_index(embeddings):
+    # One bit per dimension (sign of the normalized embedding); Hamming
+    # distance is computed with popcount.
+    index = faiss.IndexBinaryFlat(embeddings.shape[1])
+    index.add(np.packbits(embeddings > 0, axis=1))
+    return index
+
+def remove_if_exists(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+def write_json(path, obj):
+    # Compact output; orjson (when installed) is a C encoder and much faster.
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(obj))
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(obj, f)
+
+def write_arrow(path, docs, meta):
+    # Columnar copy of the corpus that app.py can memory-map.
+    batch = pa.record_batch(
+        [pa.array(docs, pa.string()), pa.array([m["source"] for m in meta], pa.string())],
+        names=["text", "source"],
+    )
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+
+def read_one(path):
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read().strip()
+    return (text, {"source": os.path.basename(path)}) if text else None
 
 def main():
     os.makedirs(OUT_DIR, exist_ok=True)
@@ -18,36 +185,53 @@ def main():
     if not paths:
         raise SystemExit("❌ No .txt files found in ./data")
 
-    docs = []
-    meta = []
-
-    for p in paths:
-        with open(p, "r", encoding="utf-8") as f:
-            text = f.read().strip()
-            if text:
-                docs.append(text)
-                meta.append({"source": os.path.basename(p)})
+    # Parallel reads keep the disk queue busy on large corpora; map() keeps path order.
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as ex:
+        pairs = [r for r in ex.map(read_one, paths) if r]
 
-    if not docs:
+    if not pairs:
         raise SystemExit("❌ Documents are empty")
 
+    docs, meta = map(list, zip(*pairs))
+
     model = SentenceTransformer(MODEL_NAME)
-    embeddings = model.encode(
-        docs,
-        convert_to_numpy=True,
-        normalize_embeddings=True
-    ).astype(np.float32)
+    embeddings = encode_docs(model, docs)
 
-    index = faiss.IndexFlatIP(embeddings.shape[1])
-    index.add(embeddings)
+    index_path = os.path.join(OUT_DIR, "faiss.index")
+    binary_path = os.path.join(OUT_DIR, "faiss_binary.index")
+    emb_path = os.path.join(OUT_DIR, "embeddings.npy")
+
+    if INDEX_KIND == "binary":
+        faiss.write_index_binary(build_binary_index(embeddings), binary_path)
+        np.save(emb_path, embeddings)
+        remove_if_exists(index_path)
+    else:
+        faiss.write_index(build_index(embeddings), index_path)
+        remove_if_exists(binary_path)
+        remove_if_exists(emb_path)
 
-    faiss.write_index(index, os.path.join(OUT_DIR, "faiss.index"))
+    write_json(os.path.join(OUT_DIR, "docs.json"), docs)
+    write_json(os.path.join(OUT_DIR, "meta.json"), meta)
 
-    with open(os.path.join(OUT_DIR, "docs.json"), "w") as f:
-        json.dump(docs, f, indent=2)
+    arrow_path = os.path.join(OUT_DIR, "docs.arrow")
+    if pa is not None:
+        write_arrow(arrow_path, docs, meta)
+    else:
+        remove_if_exists(arrow_path)
 
-    with open(os.path.join(OUT_DIR, "meta.json"), "w") as f:
-        json.dump(meta, f, indent=2)
+    onnx_dir = os.path.join(OUT_DIR, "onnx")
+    try:
+        export_onnx(model, MODEL_NAME, onnx_dir)
+        sample = docs[:INT8_SAMPLE_DOCS]
+        ref = model.encode(sample, convert_to_numpy=True).astype(np.float32, copy=False)
+        faiss.normalize_L2(ref)
+        weight_type, drift = quantize_onnx(sample, ref, onnx_dir)
+        if weight_type is None:
+            print(f"⚠️ int8 model dropped (score drift {drift:.4f}), serving FP32 ONNX")
+        else:
+            print(f"⚡ int8 ONNX model saved ({weight_type.name}, score drift {drift:.4f})")
+    except Exception as e:
+        print(f"⚠️ ONNX export skipped: {e}")
 
     print("✅ Index built successfully")
     print("📁 Files saved in /artifacts")
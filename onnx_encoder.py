@@ -0,0 +1,130 @@
+import os
+import json
+import numpy as np
+
+ONNX_DIR = "artifacts/onnx"
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+INT8_MAX_DRIFT = 0.01
+CONFIG_FILE = "encoder.json"
+
+# Exports the transformer body + tokenizer of a SentenceTransformer so queries
+# can be embedded with ONNX Runtime instead of PyTorch eager mode.
+def export_onnx(model, model_name, out_dir=ONNX_DIR):
+    import torch
+
+    os.makedirs(out_dir, exist_ok=True)
+    auto_model = model._first_module().auto_model.eval()
+    dummy = model.tokenizer(["warm up"], return_tensors="pt")
+
+    with torch.no_grad():
+        torch.onnx.export(
+            auto_model,
+            (dummy["input_ids"], dummy["attention_mask"]),
+            os.path.join(out_dir, ONNX_FILE),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "seq"},
+                "attention_mask": {0: "batch", 1: "seq"},
+                "last_hidden_state": {0: "batch", 1: "seq"},
+            },
+            opset_version=17,
+        )
+
+    model.tokenizer.save_pretrained(out_dir)
+    # A quantized model from a previous export no longer matches these weights.
+    if os.path.exists(os.path.join(out_dir, ONNX_INT8_FILE)):
+        os.remove(os.path.join(out_dir, ONNX_INT8_FILE))
+    with open(os.path.join(out_dir, CONFIG_FILE), "w") as f:
+        json.dump({"model_name": model_name, "max_seq_length": model.max_seq_length}, f, indent=2)
+
+# Dynamic int8 weight quantization (VNNI-friendly MatMuls). ref holds normalized
+# FP32 PyTorch embeddings of sample_texts, i.e. what the doc vectors are built
+# with; the int8 model is kept only if int8-query vs FP32-doc cosine scores stay
+# within INT8_MAX_DRIFT of the FP32-vs-FP32 scores.
+def quantize_onnx(sample_texts, ref, out_dir=ONNX_DIR):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    with open(os.path.join(out_dir, CONFIG_FILE), "r", encoding="utf-8") as f:
+        max_seq_length = json.load(f)["max_seq_length"]
+
+    src = os.path.join(out_dir, ONNX_FILE)
+    dst = os.path.join(out_dir, ONNX_INT8_FILE)
+
+    ref_scores = ref @ ref.T
+
+    for weight_type in (QuantType.QInt8, QuantType.QUInt8):
+        quantize_dynamic(src, dst, weight_type=weight_type)
+        q = OnnxEncoder(out_dir, max_seq_length, ONNX_INT8_FILE).encode(sample_texts, normalize_embeddings=True)
+        drift = float(np.abs(q @ ref.T - ref_scores).max())
+        if drift <= INT8_MAX_DRIFT:
+            return weight_type, drift
+
+    os.remove(dst)
+    return None, drift
+
+# Drop-in for SentenceTransformer.encode (mean pooling, as in MiniLM).
+class OnnxEncoder:
+    def __init__(self, model_dir, max_seq_length, onnx_file=ONNX_FILE):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        so = ort.SessionOptions()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        so.intra_op_num_threads = os.cpu_count() or 1
+
+        path = os.path.join(model_dir, onnx_file)
+        self.session = ort.InferenceSession(
+            path,
+            sess_options=so,
+            providers=["CPUExecutionProvider"],
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_seq_length = max_seq_length
+        # Identifies this export (FP32 vs int8, and which build) for cache keys.
+        self.variant = f"onnx:{onnx_file}:{os.path.getmtime(path):.0f}"
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, normalize_embeddings=False, **kwargs):
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        out = []
+        for i in range(0, len(sentences), batch_size):
+            enc = self.tokenizer(
+                sentences[i:i + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np",
+            )
+            mask = enc["attention_mask"].astype(np.int64)
+            hidden = self.session.run(
+                None,
+                {"input_ids": enc["input_ids"].astype(np.int64), "attention_mask": mask},
+            )[0]
+            m = mask[..., None].astype(np.float32)
+            out.append((hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None))
+
+        emb = np.concatenate(out).astype(np.float32)
+        if normalize_embeddings:
+            emb /= np.clip(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12, None)
+        return emb[0] if single else emb
+
+# None when there is no export for model_name or onnxruntime isn't installed.
+def load_onnx_encoder(model_name, model_dir=ONNX_DIR):
+    cfg_path = os.path.join(model_dir, CONFIG_FILE)
+    if not os.path.exists(cfg_path):
+        return None
+
+    with open(cfg_path, "r", encoding="utf-8") as f:
+        cfg = json.load(f)
+    if cfg.get("model_name") != model_name:
+        return None
+
+    onnx_file = ONNX_INT8_FILE if os.path.exists(os.path.join(model_dir, ONNX_INT8_FILE)) else ONNX_FILE
+    try:
+        return OnnxEncoder(model_dir, cfg["max_seq_length"], onnx_file)
+    except ImportError:
+        return None
@@ -1,37 +1,84 @@
-import json
-import faiss
-import numpy as np
-from sentence_transformers import SentenceTransformer
+import os
+import sys
+import select
+from common import OUT_DIR, MODEL_NAME, embed, get_model, load_index, read_json, search
 
-INDEX_PATH = "artifacts/faiss.index"
-DOCS_PATH = "artifacts/docs.json"
-MODEL_NAME = "all-MiniLM-L6-v2"
+DOCS_PATH = f"{OUT_DIR}/docs.json"
+TOP_K = 3
+MAX_BATCH = 16
+DRAIN_WAIT_S = 0.05
+
+def query_batches():
+    # Yields lists of queries: blocks for the first line, then drains whatever
+    # else is already queued on stdin (piped input, pasted blocks) so it can be
+    # encoded and searched in one batch.
+    if os.name == "nt":
+        # select() doesn't work on console handles; fall back to one at a time.
+        while True:
+            try:
+                yield [input("Query: ")]
+            except EOFError:
+                return
+
+    fd = sys.stdin.fileno()
+    buf = b""
+    pending = []
+    eof = False
+    while True:
+        if not pending and not eof:
+            print("Query: ", end="", flush=True)
+        while not eof and len(pending) < MAX_BATCH:
+            ready, _, _ = select.select([fd], [], [], DRAIN_WAIT_S if pending else None)
+            if not ready:
+                break
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                eof = True
+                if buf:
+                    pending.append(buf)
+                    buf = b""
+                break
+            *lines, buf = (buf + chunk).split(b"\n")
+            pending.extend(lines)
+
+        if not pending:
+            return
+        batch, pending = pending[:MAX_BATCH], pending[MAX_BATCH:]
+        yield [line.decode("utf-8", errors="replace") for line in batch]
 
 def main():
     print("🔍 Semantic Search Ready")
     print("Type a query and press Enter (type 'exit' to quit)\n")
 
-    index = faiss.read_index(INDEX_PATH)
+    index, emb = load_index(OUT_DIR)
+    docs = read_json(DOCS_PATH)
 
-    with open(DOCS_PATH, "r", encoding="utf-8") as f:
-        docs = json.load(f)
+    for batch in query_batches():
+        queries = []
+        done = False
+        for q in (q.strip() for q in batch):
+            if q.lower() in {"exit", "quit"}:
+                done = True
+                break
+            if q:
+                queries.append(q)
 
-    model = SentenceTransformer(MODEL_NAME)
+        if queries:
+            # One encode + one FAISS search over a (B, d) matrix.
+            # get_model() is cached per process: only the first batch pays the model load.
+            q_emb = embed(get_model(MODEL_NAME), queries)
+            scores, ids = search(index, emb, q_emb, TOP_K)
 
-    while True:
-        query = input("Query: ").strip()
-        if query.lower() in {"exit", "quit"}:
+            for query, row in zip(queries, ids):
+                print(f"\nTop results for: {query}" if len(queries) > 1 else "\nTop results:")
+                for rank, idx in enumerate((i for i in row if i >= 0), start=1):
+                    preview = docs[idx][:160] + ("..." if len(docs[idx]) > 160 else "")
+                    print(f"{rank}. {preview}")
+                print()
+
+        if done:
             print("👋 Exiting search")
             break
 
-        q_emb = model.encode([query], convert_to_numpy=True, normalize_embeddings=True).astype(np.float32)
-        scores, ids = index.search(q_emb, 3)
-
-        print("\nTop results:")
-        for rank, idx in enumerate(ids[0], start=1):
-            preview = docs[idx][:160] + ("..." if len(docs[idx]) > 160 else "")
-            print(f"{rank}. {preview}")
-        print()
-
 if __name__ == "__main__":
     main()
\ No newline at end of file